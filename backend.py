@@ -5,31 +5,60 @@ Simplified FastAPI backend for Tutorial Generator with Authentication and Progre
 from dotenv import load_dotenv
 load_dotenv()
 
-from fastapi import FastAPI, HTTPException, BackgroundTasks, Depends, status
+from fastapi import FastAPI, HTTPException, Depends, Request, status
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import Response
+from fastapi.responses import Response, StreamingResponse, ORJSONResponse
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from pydantic import BaseModel, EmailStr
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Tuple
 import uuid
+import base64
 import os
 import json
+import hashlib
+import time
+import threading
 from datetime import datetime, timedelta, timezone
 import asyncio
 from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
 import bcrypt
 from jose import JWTError, jwt
 import markdown
+from markdown.extensions.toc import TocExtension, slugify
+import orjson
 
 # MongoDB imports
 from pymongo import MongoClient
 from pymongo.database import Database
-from pymongo.collection import Collection
+from pymongo.errors import DuplicateKeyError
+from gridfs.errors import NoFile
+from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorCollection, AsyncIOMotorGridFSBucket
 
-# Import the flow creation function
-from flow import create_tutorial_flow
+# Job queue imports
+from arq import create_pool
+from arq.connections import ArqRedis
 
-app = FastAPI(title="Tutorial Generator API", version="1.0.0")
+from settings import MONGODB_URL, DATABASE_NAME, MONGODB_CLIENT_OPTIONS, RESULTS_BUCKET, REDIS_SETTINGS
+
+# Redis connection used to enqueue flow jobs; opened on startup
+redis_pool: Optional[ArqRedis] = None
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Job queue connection
+    global redis_pool
+    try:
+        redis_pool = await create_pool(REDIS_SETTINGS)
+        print("✅ Connected to Redis job queue")
+    except Exception as e:
+        print(f"❌ Failed to connect to Redis job queue: {e}")
+        redis_pool = None
+    yield
+    if redis_pool is not None:
+        await redis_pool.close()
+
+app = FastAPI(title="Tutorial Generator API", version="1.0.0", default_response_class=ORJSONResponse, lifespan=lifespan)
 
 # Configure CORS
 app.add_middleware(
@@ -45,34 +74,69 @@ SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key-change-in-production")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
-# MongoDB Configuration
-MONGODB_URL = os.getenv("MONGODB_URL", "mongodb://localhost:27017")
-DATABASE_NAME = os.getenv("DATABASE_NAME", "tutorial_generator")
+# bcrypt work factor for new password hashes (library default is 12).
+# Existing hashes keep their own cost and still verify.
+BCRYPT_ROUNDS = 10
+
+# Validated-token cache: token digest -> (expires_at, user document).
+# Entries live until the token expires, capped at TOKEN_CACHE_TTL_SECONDS so
+# user changes are picked up reasonably quickly.
+TOKEN_CACHE_MAX_SIZE = 4096
+TOKEN_CACHE_TTL_SECONDS = 60
+_token_cache: Dict[bytes, Tuple[float, Dict[str, Any]]] = {}
+
+# Whether the unique index on users.email exists; registration relies on it to reject duplicates
+email_index_ready = False
 
-# Initialize MongoDB connection
+# Initialize MongoDB connection.
+# Async routes use the Motor client so database calls don't block the event loop;
+# the synchronous client is only used for the startup check and index creation.
 try:
-    client = MongoClient(
-        MONGODB_URL,
-        tls=True,
-        tlsAllowInvalidCertificates=True,
-        serverSelectionTimeoutMS=10000,
-        connectTimeoutMS=20000,
-        socketTimeoutMS=30000,
-        retryWrites=True,
-        w='majority'
-    )
-    client.admin.command('ping')
-    db: Database = client[DATABASE_NAME]
-    users_collection: Collection = db.users
-    jobs_collection: Collection = db.jobs
+    client = MongoClient(MONGODB_URL, **MONGODB_CLIENT_OPTIONS)
+    try:
+        client.admin.command('ping')
+        db: Database = client[DATABASE_NAME]
+
+        # Indexes for the login lookup and per-user job queries; create_index is a no-op if they exist
+        try:
+            db.users.create_index("email", unique=True)
+            email_index_ready = True
+        except Exception as e:
+            print(f"⚠️ Failed to create unique email index, registration will check for duplicates first: {e}")
+        try:
+            db.jobs.create_index([("user_id", 1), ("created_at", -1)])
+        except Exception as e:
+            print(f"⚠️ Failed to create MongoDB indexes: {e}")
+    finally:
+        # Not used after startup; don't keep its warm connection pool open
+        client.close()
+
+    async_client = AsyncIOMotorClient(MONGODB_URL, **MONGODB_CLIENT_OPTIONS)
+    async_db = async_client[DATABASE_NAME]
+    users_collection: AsyncIOMotorCollection = async_db.users
+    jobs_collection: AsyncIOMotorCollection = async_db.jobs
+    results_fs = AsyncIOMotorGridFSBucket(async_db, bucket_name=RESULTS_BUCKET)
     print(f"✅ Connected to MongoDB at {MONGODB_URL}")
 except Exception as e:
     print(f"❌ Failed to connect to MongoDB: {e}")
     users_collection = None
     jobs_collection = None
+    results_fs = None
+
+# Fields returned by the job listing; results and logs are only fetched per job
+JOB_SUMMARY_PROJECTION = {
+    "status": 1,
+    "progress": 1,
+    "current_step": 1,
+    "created_at": 1,
+    "updated_at": 1,
+    "completed_at": 1,
+    "error": 1,
+}
 
-# Thread pool for running flows
-executor = ThreadPoolExecutor(max_workers=3)
+# Thread pool for CPU-bound request work (password hashing, markdown rendering), sized to the cores.
+# Tutorial flows run out of process in the arq worker (see worker.py).
+cpu_pool = ThreadPoolExecutor(max_workers=os.cpu_count() or 1, thread_name_prefix="cpu")
 
 # Security
 security = HTTPBearer()
@@ -111,8 +175,12 @@ class ProjectConfig(BaseModel):
     max_abstractions: Optional[int] = 10
 
 # Helper Functions
+def new_id() -> str:
+    # 22-char url-safe encoding of a random UUID; shorter than the 36-char dashed form
+    return base64.urlsafe_b64encode(uuid.uuid4().bytes).rstrip(b"=").decode('ascii')
+
 def hash_password(password: str) -> str:
-    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(rounds=BCRYPT_ROUNDS)).decode('utf-8')
 
 def verify_password(password: str, hashed_password: str) -> bool:
     return bcrypt.checkpw(password.encode('utf-8'), hashed_password.encode('utf-8'))
@@ -127,6 +195,23 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
+def _token_cache_key(token: str) -> bytes:
+    # Hash the token so raw JWTs are never kept in memory
+    return hashlib.blake2b(token.encode('utf-8'), digest_size=16).digest()
+
+def _cache_user_for_token(key: bytes, payload: Dict[str, Any], user: Dict[str, Any]):
+    now = time.time()
+    ttl = min(payload.get("exp", now) - now, TOKEN_CACHE_TTL_SECONDS)
+    if ttl <= 0:
+        return
+    if len(_token_cache) >= TOKEN_CACHE_MAX_SIZE:
+        # Drop expired entries first, then the oldest ones if still full
+        for stale_key in [k for k, (expires_at, _) in _token_cache.items() if expires_at <= now]:
+            del _token_cache[stale_key]
+        while len(_token_cache) >= TOKEN_CACHE_MAX_SIZE:
+            del _token_cache[next(iter(_token_cache))]
+    _token_cache[key] = (now + ttl, user)
+
 async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)) -> Dict[str, Any]:
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
@@ -134,6 +219,15 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
         headers={"WWW-Authenticate": "Bearer"},
     )
     
+    # Serve recently validated tokens without re-verifying or hitting the database
+    cache_key = _token_cache_key(credentials.credentials)
+    cached = _token_cache.get(cache_key)
+    if cached is not None:
+        expires_at, user = cached
+        if expires_at > time.time():
+            return user
+        _token_cache.pop(cache_key, None)
+    
     try:
         payload = jwt.decode(credentials.credentials, SECRET_KEY, algorithms=[ALGORITHM])
         email: str = payload.get("sub")
@@ -143,104 +237,147 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
         raise credentials_exception
     
     if users_collection is not None:
-        user = users_collection.find_one({"email": email})
+        user = await users_collection.find_one({"email": email})
         if user is None:
             raise credentials_exception
+        _cache_user_for_token(cache_key, payload, user)
         return user
     else:
         raise HTTPException(status_code=500, detail="Database not available")
 
-def run_tutorial_flow(job_id: str, config: ProjectConfig, user_id: str):
-    """Run the tutorial generation flow in a background thread"""
+async def load_job_result(job: Dict[str, Any]) -> Dict[str, Any]:
+    """Fetch a completed job's result from GridFS (older jobs store it inline)"""
+    if job.get("result_id") is None:
+        legacy_job = await jobs_collection.find_one({"_id": job["_id"]}, {"result": 1})
+        return (legacy_job or {}).get("result") or {}
     try:
-        # Update job status
-        if jobs_collection is not None:
-            jobs_collection.update_one(
-                {"_id": job_id},
-                {"$set": {"status": "processing", "progress": 0, "updated_at": datetime.now(timezone.utc)}}
-            )
-        
-        # Prepare shared dictionary with progress callback
-        def update_progress(step: str, progress: int, log_message: str = None):
-            timestamp = datetime.now(timezone.utc)
-            if jobs_collection is not None:
-                update_data = {
-                    "current_step": step, 
-                    "progress": progress, 
-                    "updated_at": timestamp
-                }
-                
-                if log_message:
-                    log_entry = {
-                        "timestamp": timestamp,
-                        "level": "INFO",
-                        "message": log_message,
-                        "step": step,
-                        "progress": progress
-                    }
-                    jobs_collection.update_one(
-                        {"_id": job_id},
-                        {
-                            "$set": update_data,
-                            "$push": {"logs": log_entry}
-                        }
-                    )
-                else:
-                    jobs_collection.update_one(
-                        {"_id": job_id},
-                        {"$set": update_data}
-                    )
-        
-        shared = {
-            "repo_url": config.repo_url,
-            "local_dir": config.local_dir,
-            "project_name": config.project_name,
-            "github_token": config.github_token,
-            "output_dir": "output",
-            "include_patterns": set(config.include_patterns) if config.include_patterns else None,
-            "exclude_patterns": set(config.exclude_patterns) if config.exclude_patterns else None,
-            "max_file_size": config.max_file_size,
-            "language": config.language,
-            "use_cache": config.use_cache,
-            "max_abstraction_num": config.max_abstractions,
-            "update_progress": update_progress,
+        stream = await results_fs.open_download_stream(job["result_id"])
+    except NoFile:
+        raise HTTPException(status_code=404, detail="No tutorial content found")
+    return orjson.loads(await stream.read())
+
+def job_etag(job: Dict[str, Any]) -> str:
+    completed_at = job.get("completed_at")
+    version = completed_at.isoformat() if isinstance(completed_at, datetime) else ""
+    digest = hashlib.blake2b(
+        f"{HTML_RENDER_VERSION}:{job['_id']}:{version}".encode('utf-8'), digest_size=16
+    ).hexdigest()
+    return f'"{digest}"'
+
+# HTML export
+# Markdown converters are reused across downloads instead of rebuilt per call. An instance
+# holds per-document state between reset() and convert(), so each thread keeps its own.
+_markdown_local = threading.local()
+
+def _slugify_heading(value: str, separator: str) -> str:
+    # Chapters are converted separately, so prefix heading ids with the chapter to keep
+    # repeated headings ("Summary", "Conclusion") unique within the combined page
+    return f"{_markdown_local.heading_prefix}{separator}{slugify(value, separator)}"
+
+def render_markdown(text: str, heading_prefix: str) -> str:
+    converter = getattr(_markdown_local, "converter", None)
+    if converter is None:
+        converter = _markdown_local.converter = markdown.Markdown(
+            extensions=['tables', 'fenced_code', TocExtension(slugify=_slugify_heading)]
+        )
+    _markdown_local.heading_prefix = heading_prefix
+    return converter.reset().convert(text)
+
+# Part of the download ETag. Bump it whenever the HTML shell or markdown rendering changes,
+# otherwise clients holding an "immutable" copy never see the new output.
+HTML_RENDER_VERSION = 2
+
+# Static parts of the HTML export, pre-encoded; only the job details and chapters vary
+HTML_HEAD = b"""<!DOCTYPE html>
+<html lang="en">
+<head>
+    <meta charset="UTF-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    <title>Tutorial - Job """
+
+HTML_MID = b"""</title>
+    <style>
+        body {
+            font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, sans-serif;
+            max-width: 800px;
+            margin: 0 auto;
+            padding: 20px;
+            line-height: 1.6;
+            color: #333;
         }
-        
-        # Create and run the flow
-        tutorial_flow = create_tutorial_flow()
-        tutorial_flow.run(shared)
-        
-        # Store the result
-        result = {
-            "abstractions": shared.get("abstractions", []),
-            "relationships": shared.get("relationships", {}),
-            "chapters": shared.get("chapters", []),
-            "output_dir": shared.get("final_output_dir", ""),
+        h1, h2, h3, h4, h5, h6 {
+            color: #2563eb;
+            margin-top: 2em;
+            margin-bottom: 0.5em;
         }
-        
-        if jobs_collection is not None:
-            jobs_collection.update_one(
-                {"_id": job_id},
-                {"$set": {
-                    "status": "completed",
-                    "progress": 100,
-                    "result": result,
-                    "completed_at": datetime.now(timezone.utc),
-                    "updated_at": datetime.now(timezone.utc)
-                }}
-            )
-        
-    except Exception as e:
-        if jobs_collection is not None:
-            jobs_collection.update_one(
-                {"_id": job_id},
-                {"$set": {
-                    "status": "failed",
-                    "error": str(e),
-                    "progress": 0,
-                    "updated_at": datetime.now(timezone.utc)
-                }}
-            )
+        h1 {
+            border-bottom: 2px solid #e5e7eb;
+            padding-bottom: 0.3em;
+        }
+        code {
+            background: #f1f5f9;
+            padding: 2px 6px;
+            border-radius: 4px;
+            font-family: 'Monaco', 'Menlo', 'Ubuntu Mono', monospace;
+        }
+        pre {
+            background: #f8fafc;
+            padding: 16px;
+            border-radius: 8px;
+            overflow-x: auto;
+            border: 1px solid #e2e8f0;
+        }
+        pre code {
+            background: none;
+            padding: 0;
+        }
+        blockquote {
+            border-left: 4px solid #e2e8f0;
+            padding-left: 16px;
+            margin: 16px 0;
+            color: #6b7280;
+        }
+        table {
+            border-collapse: collapse;
+            width: 100%;
+            margin: 16px 0;
+        }
+        th, td {
+            border: 1px solid #e2e8f0;
+            padding: 8px 12px;
+            text-align: left;
+        }
+        th {
+            background: #f9fafb;
+            font-weight: 600;
+        }
+        .header {
+            text-align: center;
+            margin-bottom: 2em;
+            padding: 20px;
+            background: #f8fafc;
+            border-radius: 8px;
+        }
+        .footer {
+            text-align: center;
+            margin-top: 3em;
+            padding: 20px;
+            background: #f8fafc;
+            border-radius: 8px;
+            color: #6b7280;
+        }
+        hr {
+            border: none;
+            border-top: 1px solid #e2e8f0;
+            margin: 2em 0;
+        }
+    </style>
+</head>
+<body>
+"""
+
+HTML_TAIL = b"""</body>
+</html>"""
 
 # API Routes
 
@@ -254,15 +391,14 @@ async def register(user: UserCreate):
     if users_collection is None:
         raise HTTPException(status_code=500, detail="Database not available")
     
-    # Check if user exists
-    existing_user = users_collection.find_one({"email": user.email})
-    if existing_user:
+    # Without the unique index, duplicates have to be checked explicitly
+    if not email_index_ready and await users_collection.find_one({"email": user.email}):
         raise HTTPException(status_code=400, detail="Email already registered")
     
     # Create user
-    hashed_password = hash_password(user.password)
+    hashed_password = await asyncio.get_running_loop().run_in_executor(cpu_pool, hash_password, user.password)
     user_doc = {
-        "_id": str(uuid.uuid4()),
+        "_id": new_id(),
         "email": user.email,
         "full_name": user.full_name,
         "hashed_password": hashed_password,
@@ -270,7 +406,11 @@ async def register(user: UserCreate):
         "is_active": True,
     }
     
-    users_collection.insert_one(user_doc)
+    # The unique index on email rejects existing users in the same round-trip
+    try:
+        await users_collection.insert_one(user_doc)
+    except DuplicateKeyError:
+        raise HTTPException(status_code=400, detail="Email already registered")
     
     # Create access token
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
@@ -286,8 +426,11 @@ async def login(user: UserLogin):
         raise HTTPException(status_code=500, detail="Database not available")
     
     # Verify user
-    db_user = users_collection.find_one({"email": user.email})
-    if not db_user or not verify_password(user.password, db_user["hashed_password"]):
+    db_user = await users_collection.find_one({"email": user.email})
+    # bcrypt is CPU-bound, so verify off the event loop
+    if not db_user or not await asyncio.get_running_loop().run_in_executor(
+        cpu_pool, verify_password, user.password, db_user["hashed_password"]
+    ):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
@@ -314,9 +457,13 @@ async def read_users_me(current_user: Dict[str, Any] = Depends(get_current_user)
 
 # Tutorial Generation Routes
 @app.post("/generate")
-async def generate_tutorial(config: ProjectConfig, background_tasks: BackgroundTasks, current_user: Dict[str, Any] = Depends(get_current_user)):
+async def generate_tutorial(config: ProjectConfig, current_user: Dict[str, Any] = Depends(get_current_user)):
     """Start a new tutorial generation job"""
-    job_id = str(uuid.uuid4())
+    if redis_pool is None:
+        raise HTTPException(status_code=500, detail="Job queue not available")
+    
+    job_id = new_id()
+    now = datetime.now(timezone.utc)
     
     # Initialize job tracking
     job_doc = {
@@ -325,184 +472,139 @@ async def generate_tutorial(config: ProjectConfig, background_tasks: BackgroundT
         "status": "pending",
         "progress": 0,
         "current_step": None,
-        "result": None,
+        "result_id": None,
         "error": None,
         "logs": [{
-            "timestamp": datetime.now(timezone.utc),
+            "timestamp": now,
             "level": "INFO",
             "message": f"Job created for repository: {config.repo_url or config.local_dir}",
             "step": "Initializing",
             "progress": 0
         }],
-        "created_at": datetime.now(timezone.utc),
-        "updated_at": datetime.now(timezone.utc),
+        "created_at": now,
+        "updated_at": now,
     }
     
     if jobs_collection is not None:
-        jobs_collection.insert_one(job_doc)
+        await jobs_collection.insert_one(job_doc)
     
-    # Submit the flow to run in background
-    background_tasks.add_task(run_tutorial_flow, job_id, config, current_user["_id"])
+    # Hand the flow to the worker; it survives API restarts because the job lives in Redis
+    try:
+        await redis_pool.enqueue_job("run_tutorial_flow", job_id, config.model_dump(), current_user["_id"])
+    except Exception as e:
+        # Nothing will ever pick the job up, so don't leave it pending
+        if jobs_collection is not None:
+            await jobs_collection.update_one(
+                {"_id": job_id},
+                {"$set": {
+                    "status": "failed",
+                    "error": f"Failed to queue job: {e}",
+                    "updated_at": datetime.now(timezone.utc)
+                }}
+            )
+        raise HTTPException(status_code=500, detail="Job queue not available")
     
     return {"job_id": job_id}
 
 @app.get("/status/{job_id}")
-async def get_job_status(job_id: str, current_user: Dict[str, Any] = Depends(get_current_user)):
+async def get_job_status(job_id: str, include_logs: bool = True, current_user: Dict[str, Any] = Depends(get_current_user)):
     """Get the status of a tutorial generation job"""
     if jobs_collection is None:
         raise HTTPException(status_code=500, detail="Database not available")
     
-    job = jobs_collection.find_one({"_id": job_id, "user_id": current_user["_id"]})
+    # Skip the heavy fields when the caller only needs the status; results are only read for downloads
+    projection = {"result": 0} if include_logs else {"result": 0, "logs": 0}
+    job = await jobs_collection.find_one({"_id": job_id, "user_id": current_user["_id"]}, projection)
     if not job:
         raise HTTPException(status_code=404, detail="Job not found")
     
-    return {
+    response = {
         "id": job["_id"],
         "status": job["status"],
         "progress": job["progress"],
         "current_step": job.get("current_step"),
-        "result": job.get("result"),
         "error": job.get("error"),
-        "logs": job.get("logs", [])
     }
+    if include_logs:
+        response["logs"] = job.get("logs", [])
+    return response
 
 @app.get("/jobs/{job_id}/download/html")
-async def download_job_html(job_id: str, current_user: Dict[str, Any] = Depends(get_current_user)):
+async def download_job_html(job_id: str, request: Request, current_user: Dict[str, Any] = Depends(get_current_user)):
     """Download job result as HTML"""
     if jobs_collection is None:
         raise HTTPException(status_code=500, detail="Database not available")
     
-    job = jobs_collection.find_one({"_id": job_id, "user_id": current_user["_id"]})
+    # Only what the ETag check needs; the result itself is loaded once the client's copy is stale
+    job = await jobs_collection.find_one(
+        {"_id": job_id, "user_id": current_user["_id"]},
+        {"status": 1, "completed_at": 1, "result_id": 1}
+    )
     if not job:
         raise HTTPException(status_code=404, detail="Job not found")
     
     if job["status"] != "completed":
         raise HTTPException(status_code=400, detail="Job is not completed yet")
     
-    result = job.get("result", {})
-    chapters = result.get("chapters", [])
+    # Completed jobs never change, so clients can keep the download and revalidate by ETag
+    etag = job_etag(job)
+    cache_headers = {
+        'ETag': etag,
+        'Cache-Control': 'private, max-age=31536000, immutable'
+    }
+    if_none_match = request.headers.get('if-none-match')
+    if if_none_match and etag in [tag.strip().removeprefix('W/') for tag in if_none_match.split(',')]:
+        return Response(status_code=304, headers=cache_headers)
+    
+    headers = {
+        'Content-Disposition': f'attachment; filename="tutorial-{job_id}.html"',
+        'Content-Type': 'text/html',
+        **cache_headers
+    }
+    
+    # Only the chapters are rendered; don't keep abstractions and relationships alive while streaming
+    chapters = (await load_job_result(job)).get("chapters", [])
     
     if not chapters:
         raise HTTPException(status_code=404, detail="No tutorial content found")
     
-    try:
-        # Combine all chapters into one markdown content
-        tutorial_content = ""
-        for i, chapter in enumerate(chapters):
-            tutorial_content += f"{chapter}\n\n---\n\n"
-        
-        # Convert markdown to HTML
-        html_content = markdown.markdown(tutorial_content, extensions=['tables', 'fenced_code', 'toc'])
-        
-        # Create full HTML document
-        html_full = f"""<!DOCTYPE html>
-<html lang="en">
-<head>
-    <meta charset="UTF-8">
-    <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <title>Tutorial - Job {job_id}</title>
-    <style>
-        body {{
-            font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, sans-serif;
-            max-width: 800px;
-            margin: 0 auto;
-            padding: 20px;
-            line-height: 1.6;
-            color: #333;
-        }}
-        h1, h2, h3, h4, h5, h6 {{
-            color: #2563eb;
-            margin-top: 2em;
-            margin-bottom: 0.5em;
-        }}
-        h1 {{
-            border-bottom: 2px solid #e5e7eb;
-            padding-bottom: 0.3em;
-        }}
-        code {{
-            background: #f1f5f9;
-            padding: 2px 6px;
-            border-radius: 4px;
-            font-family: 'Monaco', 'Menlo', 'Ubuntu Mono', monospace;
-        }}
-        pre {{
-            background: #f8fafc;
-            padding: 16px;
-            border-radius: 8px;
-            overflow-x: auto;
-            border: 1px solid #e2e8f0;
-        }}
-        pre code {{
-            background: none;
-            padding: 0;
-        }}
-        blockquote {{
-            border-left: 4px solid #e2e8f0;
-            padding-left: 16px;
-            margin: 16px 0;
-            color: #6b7280;
-        }}
-        table {{
-            border-collapse: collapse;
-            width: 100%;
-            margin: 16px 0;
-        }}
-        th, td {{
-            border: 1px solid #e2e8f0;
-            padding: 8px 12px;
-            text-align: left;
-        }}
-        th {{
-            background: #f9fafb;
-            font-weight: 600;
-        }}
-        .header {{
-            text-align: center;
-            margin-bottom: 2em;
-            padding: 20px;
-            background: #f8fafc;
-            border-radius: 8px;
-        }}
-        .footer {{
-            text-align: center;
-            margin-top: 3em;
-            padding: 20px;
-            background: #f8fafc;
-            border-radius: 8px;
-            color: #6b7280;
-        }}
-        hr {{
-            border: none;
-            border-top: 1px solid #e2e8f0;
-            margin: 2em 0;
-        }}
-    </style>
-</head>
-<body>
-    <div class="header">
+    # The body must be identical for every 200 with the same (strong) ETag, so it only
+    # shows job data, never the time of the download
+    completed_at = job.get('completed_at')
+    completed_text = completed_at.strftime('%B %d, %Y at %I:%M %p') if isinstance(completed_at, datetime) else 'Unknown'
+    header_html = f"""    <div class="header">
         <h1>Generated Tutorial</h1>
         <p><strong>Job ID:</strong> {job_id}</p>
-        <p><strong>Generated:</strong> {datetime.now().strftime('%B %d, %Y at %I:%M %p')}</p>
+        <p><strong>Generated:</strong> {completed_text}</p>
     </div>
     
-    {html_content}
+    """
+    footer_html = f"""
     
     <div class="footer">
         <p><em>Generated with Tutorial Generator API</em></p>
-        <p>Job completed on {job.get('completed_at', datetime.now()).strftime('%B %d, %Y at %I:%M %p') if isinstance(job.get('completed_at'), datetime) else 'Unknown'}</p>
+        <p>Job completed on {completed_text}</p>
     </div>
-</body>
-</html>"""
-        
-        headers = {
-            'Content-Disposition': f'attachment; filename="tutorial-{job_id}.html"',
-            'Content-Type': 'text/html'
-        }
-        
-        return Response(content=html_full, headers=headers, media_type='text/html')
-        
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Failed to generate HTML: {str(e)}")
+"""
+    
+    async def render_html():
+        # Chunks go straight to the client and aren't kept, so only one rendered chapter
+        # is in memory at a time
+        yield HTML_HEAD
+        yield job_id.encode('utf-8')
+        yield HTML_MID
+        yield header_html.encode('utf-8')
+        # Convert chapter by chapter on the CPU pool so output can be sent before the
+        # whole tutorial is rendered, without blocking the event loop
+        loop = asyncio.get_running_loop()
+        for chapter_num, chapter in enumerate(chapters, start=1):
+            yield (await loop.run_in_executor(
+                cpu_pool, render_markdown, f"{chapter}\n\n---\n\n", f"chapter-{chapter_num}"
+            )).encode('utf-8')
+        yield footer_html.encode('utf-8')
+        yield HTML_TAIL
+    
+    return StreamingResponse(render_html(), headers=headers, media_type='text/html')
 
 @app.get("/jobs")
 async def get_user_jobs(current_user: Dict[str, Any] = Depends(get_current_user)):
@@ -510,18 +612,15 @@ async def get_user_jobs(current_user: Dict[str, Any] = Depends(get_current_user)
     if jobs_collection is None:
         raise HTTPException(status_code=500, detail="Database not available")
     
-    jobs = list(jobs_collection.find({"user_id": current_user["_id"]}).sort("created_at", -1))
+    jobs = await jobs_collection.find(
+        {"user_id": current_user["_id"]},
+        projection=JOB_SUMMARY_PROJECTION
+    ).sort("created_at", -1).to_list(length=None)
     
-    # Convert datetime objects to ISO strings for JSON serialization
+    # FastAPI runs jsonable_encoder on the returned list (turning datetimes into ISO strings)
+    # before ORJSONResponse encodes it, so only the id needs renaming here
     for job in jobs:
-        job["id"] = job["_id"]
-        del job["_id"]
-        if "created_at" in job:
-            job["created_at"] = job["created_at"].isoformat()
-        if "updated_at" in job:
-            job["updated_at"] = job["updated_at"].isoformat()
-        if "completed_at" in job:
-            job["completed_at"] = job["completed_at"].isoformat()
+        job["id"] = job.pop("_id")
     
     return jobs
 
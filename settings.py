@@ -0,0 +1,33 @@
+"""
+Connection settings shared by the API (backend.py) and the flow worker (worker.py)
+"""
+
+import os
+from arq.connections import RedisSettings
+
+# MongoDB Configuration
+MONGODB_URL = os.getenv("MONGODB_URL", "mongodb://localhost:27017")
+DATABASE_NAME = os.getenv("DATABASE_NAME", "tutorial_generator")
+
+MONGODB_CLIENT_OPTIONS = dict(
+    tls=True,
+    tlsAllowInvalidCertificates=True,
+    serverSelectionTimeoutMS=10000,
+    connectTimeoutMS=20000,
+    socketTimeoutMS=30000,
+    retryWrites=True,
+    w='majority',
+    # Keep warm connections so requests don't pay a fresh TLS handshake under load
+    maxPoolSize=50,
+    minPoolSize=10,
+    maxIdleTimeMS=60000,
+    # Compress wire traffic (large results and logs); falls back if the server doesn't support it
+    compressors="zstd,zlib"
+)
+
+# GridFS bucket holding completed tutorial results, kept out of the jobs collection
+RESULTS_BUCKET = "tutorial_results"
+
+# Redis Configuration (job queue)
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379")
+REDIS_SETTINGS = RedisSettings.from_dsn(REDIS_URL)
@@ -0,0 +1,273 @@
+"""
+arq worker that runs tutorial generation flows outside the API process.
+
+Start it with: arq worker.WorkerSettings
+"""
+
+from dotenv import load_dotenv
+load_dotenv()
+
+from typing import Optional, Dict, Any, Tuple
+from datetime import datetime, timezone
+import asyncio
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from arq import func
+import orjson
+from gridfs import GridFSBucket
+from gridfs.errors import NoFile
+from pymongo import MongoClient
+from pymongo.database import Database
+from pymongo.collection import Collection
+
+from settings import MONGODB_URL, DATABASE_NAME, MONGODB_CLIENT_OPTIONS, RESULTS_BUCKET, REDIS_SETTINGS
+
+# Import the flow creation function
+from flow import create_tutorial_flow
+
+# Progress updates from a running flow are buffered and written in one batch per interval
+PROGRESS_FLUSH_INTERVAL_SECONDS = 0.5
+
+# Only the most recent log entries are kept on a job document
+MAX_JOB_LOGS = 200
+
+# Number of flows a single worker process runs at once. Flows are dominated by waiting on
+# LLM and GitHub responses, so they run on threads: a few dozen threads cost well under
+# 1 MB of extra RSS, while a ProcessPoolExecutor would add tens of MB per worker process.
+MAX_CONCURRENT_FLOWS = 32
+
+# Flows make many slow LLM calls; give them far more than arq's 5 minute default.
+# The task enforces this itself so a timeout can be told apart from a shutdown cancel;
+# arq's own job_timeout is a slightly later backstop.
+FLOW_TIMEOUT_SECONDS = 2 * 60 * 60
+
+# arq re-queues jobs interrupted by a worker shutdown, up to this many tries in total
+MAX_FLOW_TRIES = 5
+
+# Initialize MongoDB connection (flows run in threads, so the synchronous client is used)
+try:
+    client = MongoClient(MONGODB_URL, **MONGODB_CLIENT_OPTIONS)
+    client.admin.command('ping')
+    db: Database = client[DATABASE_NAME]
+    jobs_collection: Collection = db.jobs
+    results_fs = GridFSBucket(db, bucket_name=RESULTS_BUCKET)
+    print(f"✅ Connected to MongoDB at {MONGODB_URL}")
+except Exception as e:
+    print(f"❌ Failed to connect to MongoDB: {e}")
+    jobs_collection = None
+    results_fs = None
+
+class FlowCancelled(BaseException):
+    """Raised inside a flow thread once its arq job has timed out or been cancelled.
+
+    Derives from BaseException so pocketflow's node retry loop (which catches Exception)
+    doesn't sleep and retry before the flow stops.
+    """
+
+def mark_job_failed(job_id: str, error: str):
+    if jobs_collection is not None:
+        jobs_collection.update_one(
+            {"_id": job_id},
+            {"$set": {
+                "status": "failed",
+                "error": error,
+                "progress": 0,
+                "updated_at": datetime.now(timezone.utc)
+            }}
+        )
+
+def mark_job_requeued(job_id: str):
+    if jobs_collection is not None:
+        jobs_collection.update_one(
+            {"_id": job_id},
+            {
+                "$set": {
+                    "status": "pending",
+                    "current_step": "Waiting for a worker after restart",
+                    "progress": 0,
+                    "updated_at": datetime.now(timezone.utc)
+                }
+            }
+        )
+
+def run_tutorial_flow(job_id: str, config: Dict[str, Any], user_id: str, cancelled: Optional[threading.Event] = None):
+    """Run the tutorial generation flow in a worker thread"""
+    cancelled = cancelled or threading.Event()
+    try:
+        # Update job status
+        if jobs_collection is not None:
+            jobs_collection.update_one(
+                {"_id": job_id},
+                {"$set": {"status": "processing", "progress": 0, "error": None, "updated_at": datetime.now(timezone.utc)}}
+            )
+        
+        # Progress callbacks are queued and flushed in batches instead of one write per step
+        pending_updates: "queue.Queue[Tuple[Dict[str, Any], Optional[Dict[str, Any]]]]" = queue.Queue()
+        stop_flushing = threading.Event()
+        
+        def flush_progress():
+            latest_state = None
+            log_entries = []
+            while True:
+                try:
+                    update_data, log_entry = pending_updates.get_nowait()
+                except queue.Empty:
+                    break
+                latest_state = update_data
+                if log_entry:
+                    log_entries.append(log_entry)
+            
+            # Once cancelled the job is already marked failed or re-queued; don't overwrite its progress
+            if latest_state is None or jobs_collection is None or cancelled.is_set():
+                return
+            update = {"$set": latest_state}
+            if log_entries:
+                update["$push"] = {"logs": {"$each": log_entries, "$slice": -MAX_JOB_LOGS}}
+            jobs_collection.update_one({"_id": job_id}, update)
+        
+        def flush_safely():
+            # A failed progress write must neither stop later flushes nor replace the flow's own error
+            try:
+                flush_progress()
+            except Exception as e:
+                print(f"⚠️ Failed to write progress for job {job_id}: {e}")
+        
+        def flush_periodically():
+            while not stop_flushing.wait(PROGRESS_FLUSH_INTERVAL_SECONDS):
+                flush_safely()
+        
+        # Prepare shared dictionary with progress callback
+        def update_progress(step: str, progress: int, log_message: str = None):
+            # A thread can't be killed, so a cancelled flow stops at its next progress report
+            if cancelled.is_set():
+                raise FlowCancelled()
+            timestamp = datetime.now(timezone.utc)
+            update_data = {
+                "current_step": step, 
+                "progress": progress, 
+                "updated_at": timestamp
+            }
+            
+            log_entry = None
+            if log_message:
+                log_entry = {
+                    "timestamp": timestamp,
+                    "level": "INFO",
+                    "message": log_message,
+                    "step": step,
+                    "progress": progress
+                }
+            pending_updates.put((update_data, log_entry))
+        
+        shared = {
+            "repo_url": config["repo_url"],
+            "local_dir": config["local_dir"],
+            "project_name": config["project_name"],
+            "github_token": config["github_token"],
+            "output_dir": "output",
+            "include_patterns": set(config["include_patterns"]) if config["include_patterns"] else None,
+            "exclude_patterns": set(config["exclude_patterns"]) if config["exclude_patterns"] else None,
+            "max_file_size": config["max_file_size"],
+            "language": config["language"],
+            "use_cache": config["use_cache"],
+            "max_abstraction_num": config["max_abstractions"],
+            "update_progress": update_progress,
+        }
+        
+        # Create and run the flow
+        flusher = threading.Thread(target=flush_periodically, name=f"progress-{job_id}", daemon=True)
+        flusher.start()
+        try:
+            tutorial_flow = create_tutorial_flow()
+            tutorial_flow.run(shared)
+        finally:
+            # Write whatever is still buffered before the final status update
+            stop_flushing.set()
+            flusher.join()
+            flush_safely()
+        
+        # Store the result
+        result = {
+            "abstractions": shared.get("abstractions", []),
+            "relationships": shared.get("relationships", {}),
+            "chapters": shared.get("chapters", []),
+            "output_dir": shared.get("final_output_dir", ""),
+        }
+        
+        if cancelled.is_set():
+            return
+        
+        if jobs_collection is not None:
+            # The result can be megabytes; store it in GridFS so job queries stay small.
+            # The file id is the job id, so a retried job replaces its earlier result file.
+            result_id = job_id
+            try:
+                results_fs.delete(result_id)
+            except NoFile:
+                pass
+            results_fs.upload_from_stream_with_id(result_id, job_id, orjson.dumps(result))
+            completed_at = datetime.now(timezone.utc)
+            jobs_collection.update_one(
+                {"_id": job_id},
+                {"$set": {
+                    "status": "completed",
+                    "progress": 100,
+                    "result_id": result_id,
+                    "completed_at": completed_at,
+                    "updated_at": completed_at
+                }}
+            )
+        
+    except FlowCancelled:
+        # run_tutorial_flow_task has already recorded the job as failed or re-queued
+        pass
+    except Exception as e:
+        mark_job_failed(job_id, str(e))
+
+async def run_tutorial_flow_task(ctx: Dict[str, Any], job_id: str, config: Dict[str, Any], user_id: str):
+    """arq task: run the blocking flow on the worker's thread pool"""
+    loop = asyncio.get_running_loop()
+    cancelled = threading.Event()
+    ctx["cancel_events"].add(cancelled)
+    try:
+        await asyncio.wait_for(
+            loop.run_in_executor(ctx["executor"], run_tutorial_flow, job_id, config, user_id, cancelled),
+            FLOW_TIMEOUT_SECONDS
+        )
+    except asyncio.TimeoutError:
+        # Stop the flow thread and record the failure instead of leaving the job "processing"
+        cancelled.set()
+        mark_job_failed(job_id, "Tutorial generation timed out")
+        raise
+    except asyncio.CancelledError:
+        # A worker shutdown cancels running jobs and arq runs them again later, so the job
+        # goes back to pending unless this was its last try
+        cancelled.set()
+        if ctx.get("job_try", 1) >= MAX_FLOW_TRIES:
+            mark_job_failed(job_id, "Tutorial generation was interrupted too many times")
+        else:
+            mark_job_requeued(job_id)
+        raise
+    finally:
+        ctx["cancel_events"].discard(cancelled)
+
+async def startup(ctx: Dict[str, Any]):
+    ctx["executor"] = ThreadPoolExecutor(max_workers=MAX_CONCURRENT_FLOWS, thread_name_prefix="flow")
+    ctx["cancel_events"] = set()
+
+async def shutdown(ctx: Dict[str, Any]):
+    # Ask running flows to stop and don't wait for them; a flow can run for hours
+    for cancelled in ctx["cancel_events"]:
+        cancelled.set()
+    ctx["executor"].shutdown(wait=False, cancel_futures=True)
+
+class WorkerSettings:
+    functions = [func(run_tutorial_flow_task, name="run_tutorial_flow")]
+    redis_settings = REDIS_SETTINGS
+    on_startup = startup
+    on_shutdown = shutdown
+    max_jobs = MAX_CONCURRENT_FLOWS
+    max_tries = MAX_FLOW_TRIES
+    job_timeout = FLOW_TIMEOUT_SECONDS + 60